@@ -1 +1,3 @@
 from chrs_persiann.chrs import CHRS
+from chrs_persiann.stats import summarize_archive, write_table
+from chrs_persiann.planner import plan_order, expected_timestamps, missing_timestamps, find_gaps
@@ -5,6 +5,8 @@ import requests
 
 from pathlib import Path
 
+from chrs_persiann.planner import plan_order, validate_period
+
 
 class CHRS:
 
@@ -124,7 +126,11 @@ class CHRS:
             print('Please provide the correct data type.')
             return None
 
-        # TODO: Check the input date format is correct
+        try:
+            validate_period(start, end, data_type, timestep)
+        except ValueError as e:
+            print(e)
+            return None
 
         timestep_alt = timestep_dict[timestep.lower()]
 
@@ -331,6 +337,13 @@ class CHRS:
             (bool): True if Downloaded successfully
         """
 
+        try:
+            plan = plan_order(start, end, data_type, timestep, file_format)
+        except ValueError as e:
+            print(e)
+            print('Failed to query the data, Try Again.')
+            return None
+
         print('Querying data & Placing the order...')
         print(f'''Query Params:
 
@@ -341,6 +354,8 @@ data type - {data_type}
 file format - {file_format}
 compression format - {compression}
 download path - {download_path}
+expected files - {plan['files']}
+estimated size - {plan['estimated_bytes'] / 1024 ** 2:.1f} MB (uncompressed)
 ''')
 
         body = self.query_url(start, end, data_type,
@@ -0,0 +1,286 @@
+import numpy as np
+
+
+# first day of data for each collection
+AVAILABILITY = {
+    'PERSIANN': np.datetime64('2000-03-01T00', 'h'),
+    'CCS': np.datetime64('2003-01-01T00', 'h'),
+    'CDR': np.datetime64('1983-01-01T00', 'h'),
+    'PDIR': np.datetime64('2000-03-01T00', 'h'),
+}
+
+ALL_TIMESTEPS = ['1hrly', '3hrly', '6hrly', 'daily', 'monthly', 'yearly']
+
+TIMESTEPS = {
+    'PERSIANN': ALL_TIMESTEPS,
+    'CCS': ALL_TIMESTEPS,
+    'CDR': ['daily', 'monthly', 'yearly'],
+    'PDIR': ALL_TIMESTEPS,
+}
+
+# numpy datetime unit and step of each timestep
+STEPS = {
+    '1hrly': ('h', 1),
+    '3hrly': ('h', 3),
+    '6hrly': ('h', 6),
+    'daily': ('D', 1),
+    'monthly': ('M', 1),
+    'yearly': ('Y', 1),
+}
+
+# global grid (rows, cols) of each collection, 60S - 60N
+GRIDS = {
+    'PERSIANN': (480, 1440),
+    'CCS': (3000, 9000),
+    'CDR': (480, 1440),
+    'PDIR': (3000, 9000),
+}
+
+# approximate uncompressed bytes per pixel of each file format
+BYTES_PER_PIXEL = {
+    'ArcGrid': 6,
+    'Tif': 4,
+    'NetCDF': 4,
+}
+
+
+def parse_timestamps(values):
+    """Parse 'yyyymmddHH' strings into hourly datetime64 values in one
+    vectorized pass. Malformed entries (wrong length, non digits, impossible
+    month, day or hour) become NaT.
+
+    Args:
+        values (str or sequence): timestamp(s) in 'yyyymmddHH' format
+
+    Returns:
+        (np.ndarray): datetime64[h] array of the same shape
+    """
+    text = np.asarray(values, dtype=str)
+    ok = (np.char.str_len(text) == 10) & np.char.isdigit(text)
+    num = np.where(ok, text, '0').astype(np.int64)
+
+    year = num // 1000000
+    month = num // 10000 % 100
+    day = num // 100 % 100
+    hour = num % 100
+
+    ok &= (month >= 1) & (month <= 12) & (hour <= 23) & (day >= 1)
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0)
+    first = months.astype('datetime64[M]').astype('datetime64[D]')
+    length = (months + 1).astype('datetime64[M]').astype('datetime64[D]') - first
+    ok &= day <= length.astype(np.int64)
+
+    hours = first.astype('datetime64[h]') + (day - 1) * 24 + hour
+    return np.where(ok, hours, np.datetime64('NaT', 'h'))
+
+
+def format_timestamps(timestamps):
+    """Format datetime64 values back into 'yyyymmddHH' strings
+
+    Args:
+        timestamps (np.ndarray): datetime64 values of any unit
+
+    Returns:
+        (np.ndarray): array of 'yyyymmddHH' strings
+    """
+    text = np.datetime_as_string(np.asarray(timestamps).astype('datetime64[h]'),
+                                 unit='h')
+    return np.char.replace(np.char.replace(text, '-', ''), 'T', '')
+
+
+def _parse_period(start, end, timestep: str):
+    """Parse the start and end of a period, 'yyyymmddHH' strings or
+    datetime64 values, raising a ValueError for malformed dates and for hours
+    that are not on the time step"""
+    unit, step = STEPS[timestep]
+    parsed = []
+    for name, value in (('start', start), ('end', end)):
+        if isinstance(value, str):
+            ts = parse_timestamps(value)[()]
+        elif isinstance(value, np.datetime64):
+            ts = value.astype('datetime64[h]')
+        else:
+            ts = np.datetime64('NaT', 'h')
+        if np.isnat(ts):
+            raise ValueError(f'Invalid {name} date {value}, '
+                             f'expected a valid date in yyyymmddHH format')
+
+        hour = int(ts.astype(np.int64) % 24)
+        if unit == 'h' and hour % step:
+            hours = ', '.join(f'{h:02d}' for h in range(0, 24, step))
+            raise ValueError(f'Invalid {name} hour {hour:02d} for '
+                             f'{timestep}, options: {hours}')
+        parsed.append(ts)
+    return parsed
+
+
+def validate_period(start: str, end: str, data_type: str, timestep: str):
+    """Check a requested period against the availability window of the data
+    collection and the hours allowed for the time step, before an order is
+    placed.
+
+    Args:
+        start (str or np.datetime64): start date in 'yyyymmddHH' format
+
+        end (str or np.datetime64): end date in 'yyyymmddHH' format
+
+        data_type (str): Data Collection - PERSIANN, CCS, CDR or PDIR
+
+        timestep (str): 1hrly, 3hrly, 6hrly, daily, monthly or yearly
+
+    Raises:
+        ValueError: with a message describing the first problem found
+
+    Returns:
+        (tuple): start and end truncated to the time step, as datetime64
+    """
+    if data_type not in AVAILABILITY:
+        raise ValueError('Please provide the correct data type.')
+
+    if timestep not in TIMESTEPS[data_type]:
+        raise ValueError(f'{timestep} timestep is not available for {data_type}, '
+                         f'options: {", ".join(TIMESTEPS[data_type])}')
+
+    start_ts, end_ts = _parse_period(start, end, timestep)
+
+    unit, step = STEPS[timestep]
+    start_ts = start_ts.astype(f'datetime64[{unit}]')
+    end_ts = end_ts.astype(f'datetime64[{unit}]')
+    if end_ts < start_ts:
+        raise ValueError(f'End date {end} is before start date {start}')
+
+    available = AVAILABILITY[data_type].astype(f'datetime64[{unit}]')
+    if start_ts < available:
+        raise ValueError(f'{data_type} data is available from '
+                         f'{format_timestamps(AVAILABILITY[data_type])}, '
+                         f'start date {start} is too early')
+
+    now = np.datetime64('now', unit)
+    if end_ts > now:
+        raise ValueError(f'{data_type} data is available up to '
+                         f'{format_timestamps(now)}, end date {end} is too late')
+
+    return start_ts, end_ts
+
+
+def expected_timestamps(start, end, timestep: str):
+    """Enumerate every timestamp of a period at the given time step
+
+    Args:
+        start (str or np.datetime64): start date, 'yyyymmddHH' strings are parsed
+
+        end (str or np.datetime64): end date, 'yyyymmddHH' strings are parsed
+
+        timestep (str): 1hrly, 3hrly, 6hrly, daily, monthly or yearly
+
+    Raises:
+        ValueError: if start or end is not a valid date or, for hourly time
+                    steps, not on one of its hours
+
+    Returns:
+        (np.ndarray): sorted datetime64 array in the unit of the time step
+    """
+    unit, step = STEPS[timestep]
+    start, end = _parse_period(start, end, timestep)
+    start = np.datetime64(start, unit)
+    end = np.datetime64(end, unit)
+    return np.arange(start, end + 1, step, dtype=f'datetime64[{unit}]')
+
+
+def expected_count(start, end, timestep: str):
+    """Number of files in a period at the given time step, without
+    enumerating them"""
+    unit, step = STEPS[timestep]
+    start, end = _parse_period(start, end, timestep)
+    span = np.datetime64(end, unit) - np.datetime64(start, unit)
+    return max(int(span.astype(np.int64)) // step + 1, 0)
+
+
+def plan_order(start: str, end: str, data_type: str, timestep: str = 'monthly',
+               file_format: str = 'Tif'):
+    """Validate a period and estimate the size of the order before placing
+    it with `query_url`.
+
+    Args:
+        start (str or np.datetime64): start date in 'yyyymmddHH' format
+
+        end (str or np.datetime64): end date in 'yyyymmddHH' format
+
+        data_type (str): Data Collection - PERSIANN, CCS, CDR or PDIR
+
+        timestep (str, optional): 1hrly, 3hrly, 6hrly, daily, monthly or
+                    yearly. Defaults to 'monthly'.
+
+        file_format (str, optional): ArcGrid, Tif or NetCDF. Defaults to 'Tif'.
+
+    Raises:
+        ValueError: if the period is not valid for the collection
+
+    Returns:
+        plan (dict): start, end, number of files and estimated bytes, the
+                    uncompressed size and so an upper bound of the archive
+    """
+    if file_format not in BYTES_PER_PIXEL:
+        raise ValueError('Please provide a valid data format for the download')
+
+    start_ts, end_ts = validate_period(start, end, data_type, timestep)
+    files = expected_count(start_ts, end_ts, timestep)
+    rows, cols = GRIDS[data_type]
+    return {
+        'start': start_ts,
+        'end': end_ts,
+        'files': files,
+        'estimated_bytes': files * rows * cols * BYTES_PER_PIXEL[file_format],
+    }
+
+
+def missing_timestamps(expected, present):
+    """Timestamps of `expected` that are not in `present`
+
+    Args:
+        expected (np.ndarray): datetime64 timestamps, e.g. from
+                    `expected_timestamps`
+
+        present (sequence): timestamps already available, datetime64 values
+                    or 'yyyymmddHH' strings
+
+    Returns:
+        (np.ndarray): sorted missing timestamps in the unit of `expected`
+    """
+    expected = np.asarray(expected)
+    present = np.asarray(present)
+    if present.dtype.kind in 'US':
+        present = parse_timestamps(present)
+    if present.size == 0:
+        return np.sort(expected)
+
+    # membership through a sorted search, much faster than np.setdiff1d on
+    # datetime64 for millions of timestamps
+    present = np.sort(present.astype(expected.dtype))
+    idx = np.searchsorted(present, expected)
+    idx[idx == present.size] = 0
+    return np.sort(expected[present[idx] != expected])
+
+
+def find_gaps(missing, timestep: str):
+    """Group missing timestamps into contiguous runs, so each gap can be
+    ordered as a single period
+
+    Args:
+        missing (np.ndarray): sorted datetime64 timestamps, e.g. from
+                    `missing_timestamps`
+
+        timestep (str): 1hrly, 3hrly, 6hrly, daily, monthly or yearly
+
+    Returns:
+        (np.ndarray): (n, 2) array of the first and last timestamp of each gap
+    """
+    unit, step = STEPS[timestep]
+    missing = np.asarray(missing).astype(f'datetime64[{unit}]')
+    if missing.size == 0:
+        return missing.reshape(0, 2)
+
+    breaks = np.flatnonzero(np.diff(missing).astype(np.int64) != step) + 1
+    firsts = np.concatenate(([0], breaks))
+    lasts = np.concatenate((breaks - 1, [missing.size - 1]))
+    return np.stack((missing[firsts], missing[lasts]), axis=1)
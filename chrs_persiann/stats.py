@@ -0,0 +1,417 @@
+import io
+import re
+import csv
+import itertools
+import zipfile
+import numpy as np
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+
+NODATA = -9999.0
+WET_THRESHOLD = 0.1  # mm, pixels above this are counted as wet
+
+RASTER_FORMATS = {
+    '.asc': 'ArcGrid',
+    '.tif': 'Tif',
+    '.tiff': 'Tif',
+}
+
+# rasters fetch_data can order that cannot be read in chunks yet
+UNSUPPORTED_FORMATS = {
+    '.nc': 'NetCDF',
+    '.nc4': 'NetCDF',
+}
+
+
+class QuantileSketch:
+    """Mergeable approximate percentile sketch built on a fixed set of
+    log-spaced bins. Two sketches with the same bins are merged by adding
+    their counts, so partial results from row chunks, processes or time steps
+    can be combined without holding on to the values.
+
+    Args:
+        lo (float, optional): smallest positive bin edge. Defaults to 0.01.
+
+        hi (float, optional): largest bin edge. Defaults to 10000.
+
+        bins (int, optional): number of log-spaced edges between lo and hi.
+                    The relative error of a percentile is about
+                    (hi / lo) ** (1 / bins) - 1. Defaults to 512.
+    """
+
+    def __init__(self, lo: float = 0.01, hi: float = 10000.0, bins: int = 512):
+        # exact zeros (dry pixels) get a bin of their own, [0, smallest float)
+        self.edges = np.concatenate(([0.0, np.nextafter(0.0, 1.0)],
+                                     np.geomspace(lo, hi, bins)))
+        self.counts = np.zeros(self.edges.size + 1, dtype=np.int64)
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values: np.ndarray):
+        """Add a 1d array of valid values to the sketch"""
+        if values.size == 0:
+            return
+        idx = np.searchsorted(self.edges, values, side='right')
+        self.counts += np.bincount(idx, minlength=self.counts.size)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def merge(self, other: 'QuantileSketch'):
+        """Fold the counts of another sketch into this one"""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('Cannot merge sketches with different bins')
+        self.counts += other.counts
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def percentiles(self, q):
+        """Approximate percentiles (0 - 100) of the values seen so far
+
+        Args:
+            q (float or sequence): percentile(s) to compute
+
+        Returns:
+            (np.ndarray): percentile values, NaN if the sketch is empty
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        total = self.counts.sum()
+        if total == 0:
+            return np.full(q.shape, np.nan)
+
+        # bin k holds values in [lower[k], upper[k]), clipped to what was seen
+        lower = np.clip(np.concatenate(([self.minimum], self.edges)),
+                        self.minimum, self.maximum)
+        upper = np.clip(np.concatenate((self.edges, [self.maximum])),
+                        self.minimum, self.maximum)
+        upper[1] = lower[1]  # the zero bin only ever holds 0
+
+        cum = np.cumsum(self.counts)
+        rank = q / 100.0 * (total - 1)
+        k = np.searchsorted(cum, rank, side='right')
+        before = np.where(k > 0, cum[k - 1], 0)
+        frac = (rank - before + 0.5) / self.counts[k]
+        return lower[k] + np.clip(frac, 0.0, 1.0) * (upper[k] - lower[k])
+
+
+class RasterStats:
+    """Running mean, max, wet-pixel fraction and percentile sketch for the
+    valid pixels of a raster. Pixels equal to the nodata value or NaN are
+    ignored. Accumulators are mergeable.
+
+    Args:
+        nodata (float, optional): nodata value of the raster.
+                    Defaults to -9999.
+
+        wet_threshold (float, optional): pixels with values above this are
+                    counted as wet. Defaults to 0.1.
+    """
+
+    def __init__(self, nodata: float = NODATA, wet_threshold: float = WET_THRESHOLD):
+        self.nodata = nodata
+        self.wet_threshold = wet_threshold
+        self.count = 0
+        self.total = 0.0
+        self.maximum = -np.inf
+        self.wet = 0
+        self.sketch = QuantileSketch()
+
+    def update(self, block: np.ndarray):
+        """Add a block of pixels (any shape) to the accumulator"""
+        values = block.ravel()
+        valid = ~np.isnan(values)
+        if self.nodata is not None:
+            valid &= values != self.nodata
+        values = values[valid]
+        if values.size == 0:
+            return
+
+        self.count += values.size
+        self.total += float(values.sum(dtype=np.float64))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.wet += int(np.count_nonzero(values > self.wet_threshold))
+        self.sketch.update(values)
+
+    def merge(self, other: 'RasterStats'):
+        """Fold another accumulator into this one"""
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+        self.wet += other.wet
+        self.sketch.merge(other.sketch)
+        return self
+
+    def result(self, percentiles=(50, 90, 99)):
+        """Summarise the accumulator
+
+        Args:
+            percentiles (sequence, optional): percentiles to report.
+                        Defaults to (50, 90, 99).
+
+        Returns:
+            (dict): count, mean, max, wet_fraction and p<q> values
+        """
+        if self.count == 0:
+            res = {'count': 0, 'mean': np.nan, 'max': np.nan,
+                   'wet_fraction': np.nan}
+        else:
+            res = {
+                'count': self.count,
+                'mean': self.total / self.count,
+                'max': self.maximum,
+                'wet_fraction': self.wet / self.count,
+            }
+        for q, v in zip(percentiles, self.sketch.percentiles(percentiles)):
+            res[f'p{q:g}'] = float(v)
+        return res
+
+
+def _region_window(geo: dict, name: str, bbox):
+    """Row and column pixel ranges of a (west, south, east, north) box"""
+    if name == 'global':
+        raise ValueError("'global' is reserved for the whole grid, "
+                         "please rename the region")
+
+    west, south, east, north = bbox
+    cs = geo['cellsize']
+    col0 = int(np.floor((west - geo['x0']) / cs))
+    col1 = int(np.ceil((east - geo['x0']) / cs))
+    row0 = int(np.floor((geo['y0'] - north) / cs))
+    row1 = int(np.ceil((geo['y0'] - south) / cs))
+    window = (max(row0, 0), min(row1, geo['nrows']),
+              max(col0, 0), min(col1, geo['ncols']))
+
+    if window[0] >= window[1] or window[2] >= window[3]:
+        extent = (geo['x0'], geo['y0'] - geo['nrows'] * cs,
+                  geo['x0'] + geo['ncols'] * cs, geo['y0'])
+        raise ValueError(f'Region {name} {tuple(bbox)} does not overlap the '
+                         f'grid extent {extent} (west, south, east, north)')
+    return window
+
+
+def _read_arcgrid(archive: str, member: str, chunk_rows: int):
+    """Read an ArcGrid (ascii) archive member as (geo, row chunks) without
+    extracting it or loading the whole grid"""
+    zf = zipfile.ZipFile(archive)
+    fh = io.TextIOWrapper(zf.open(member), encoding='ascii')
+
+    header = {}
+    line = fh.readline()
+    while line and re.match(r'\s*[A-Za-z]', line):
+        key, value = line.split()[:2]
+        header[key.lower()] = float(value)
+        line = fh.readline()
+
+    cs = header['cellsize']
+    nrows, ncols = int(header['nrows']), int(header['ncols'])
+    x0 = header.get('xllcorner', header.get('xllcenter', 0.0) - cs / 2)
+    yll = header.get('yllcorner', header.get('yllcenter', 0.0) - cs / 2)
+    geo = {
+        'x0': x0,
+        'y0': yll + nrows * cs,
+        'cellsize': cs,
+        'nrows': nrows,
+        'ncols': ncols,
+        'nodata': header.get('nodata_value', NODATA),
+    }
+
+    def blocks():
+        # rows may wrap over several lines, so the values are read as a flat
+        # stream and reshaped into ncols wide rows
+        try:
+            row, rest = 0, np.empty(0, dtype=np.float32)
+            lines = itertools.chain([line], fh)
+            while True:
+                batch = list(itertools.islice(lines, chunk_rows))
+                if not batch:
+                    break
+                values = np.fromstring(''.join(batch), dtype=np.float32, sep=' ')
+                values = np.concatenate((rest, values))
+                n = values.size // ncols
+                rest = values[n * ncols:]
+                if n:
+                    yield row, values[:n * ncols].reshape(n, ncols)
+                    row += n
+            if rest.size or row != nrows:
+                raise ValueError(f'{member} has {row * ncols + rest.size} '
+                                 f'values, expected {nrows} rows of {ncols}')
+        finally:
+            fh.close()
+            zf.close()
+
+    return geo, blocks()
+
+
+def _read_tif(archive: str, member: str, chunk_rows: int):
+    """Read a GeoTiff archive member as (geo, row chunks) with windowed reads
+    through rasterio"""
+    try:
+        import rasterio
+        from rasterio.windows import Window
+    except ImportError:
+        raise ImportError('Reading Tif files needs rasterio, '
+                          'install it with `pip install rasterio`')
+
+    src = rasterio.open(f'zip://{Path(archive).absolute()}!/{member}')
+    geo = {
+        'x0': src.transform.c,
+        'y0': src.transform.f,
+        'cellsize': src.transform.a,
+        'nrows': src.height,
+        'ncols': src.width,
+        'nodata': NODATA if src.nodata is None else src.nodata,
+    }
+
+    def blocks():
+        try:
+            for row in range(0, src.height, chunk_rows):
+                height = min(chunk_rows, src.height - row)
+                yield row, src.read(1, window=Window(0, row, src.width, height))
+        finally:
+            src.close()
+
+    return geo, blocks()
+
+
+def _summarize_member(archive: str, member: str, regions: dict,
+                      chunk_rows: int, wet_threshold: float):
+    """Accumulate global and regional statistics for a single archive member.
+    Module level so it can be sent to worker processes."""
+    suffix = Path(member).suffix.lower()
+    reader = _read_tif if RASTER_FORMATS[suffix] == 'Tif' else _read_arcgrid
+    geo, blocks = reader(archive, member, chunk_rows)
+
+    windows = {'global': (0, geo['nrows'], 0, geo['ncols'])}
+    for name, bbox in regions.items():
+        windows[name] = _region_window(geo, name, bbox)
+
+    stats = {name: RasterStats(geo['nodata'], wet_threshold) for name in windows}
+    for row, block in blocks:
+        row_end = row + block.shape[0]
+        for name, (r0, r1, c0, c1) in windows.items():
+            lo, hi = max(r0, row), min(r1, row_end)
+            if lo < hi and c0 < c1:
+                stats[name].update(block[lo - row:hi - row, c0:c1])
+
+    return stats
+
+
+def member_timestamp(member: str):
+    """Timestamp label of an archive member, the last run of digits in the
+    file name (falls back to the file name itself)"""
+    stem = Path(member).stem
+    digits = re.findall(r'\d+', stem)
+    return digits[-1] if digits else stem
+
+
+def summarize_archive(archive: str, regions: dict = None,
+                      percentiles=(50, 90, 99), chunk_rows: int = 256,
+                      wet_threshold: float = WET_THRESHOLD, workers: int = 1,
+                      include_total: bool = False):
+    """Computes per time step statistics for every raster in a compressed
+    data file downloaded with `fetch_data`. Members are read one at a time,
+    in chunks of rows, straight from the archive without extracting it.
+    ArcGrid and Tif rasters are supported, NetCDF is not yet.
+
+    Args:
+        archive (str): path of the downloaded zip file
+
+        regions (dict, optional): named regions to summarise alongside the
+                    whole grid, as name -> (west, south, east, north) in
+                    degrees. Defaults to None.
+
+        percentiles (sequence, optional): percentiles to report.
+                    Defaults to (50, 90, 99).
+
+        chunk_rows (int, optional): number of raster rows read at a time.
+                    Defaults to 256.
+
+        wet_threshold (float, optional): pixels with values above this are
+                    counted as wet. Defaults to 0.1.
+
+        workers (int, optional): number of processes the members are spread
+                    across. Defaults to 1.
+
+        include_total (bool, optional): append a 'total' row merging the
+                    statistics of all time steps. Defaults to False.
+
+    Raises:
+        ValueError: if the archive holds rasters that cannot be read or no
+                    rasters at all, or if a region does not overlap the grid
+
+    Returns:
+        rows (list): one dict per time step with the timestamp and
+                    <region>_<metric> values, sorted by timestamp
+    """
+    regions = regions or {}
+    archive = str(Path(archive).expanduser().absolute())
+
+    with zipfile.ZipFile(archive) as zf:
+        names = zf.namelist()
+
+    unsupported = [m for m in names
+                   if Path(m).suffix.lower() in UNSUPPORTED_FORMATS]
+    if unsupported:
+        formats = sorted({UNSUPPORTED_FORMATS[Path(m).suffix.lower()]
+                          for m in unsupported})
+        raise ValueError(f'{", ".join(formats)} rasters are not supported, '
+                         f'{len(unsupported)} member(s) of {archive} cannot be '
+                         f'read, please order ArcGrid or Tif data')
+
+    members = sorted((m for m in names
+                      if Path(m).suffix.lower() in RASTER_FORMATS),
+                     key=member_timestamp)
+    if not members:
+        raise ValueError(f'No ArcGrid or Tif rasters found in {archive}')
+
+    args = [(archive, m, regions, chunk_rows, wet_threshold) for m in members]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_summarize_member, *zip(*args)))
+    else:
+        results = [_summarize_member(*a) for a in args]
+
+    def to_row(timestamp, stats):
+        row = {'timestamp': timestamp}
+        for name, acc in stats.items():
+            for metric, value in acc.result(percentiles).items():
+                row[f'{name}_{metric}'] = value
+        return row
+
+    rows = [to_row(member_timestamp(m), s) for m, s in zip(members, results)]
+
+    if include_total and results:
+        total = results[0]
+        for stats in results[1:]:
+            for name, acc in stats.items():
+                total[name].merge(acc)
+        rows.append(to_row('total', total))
+
+    return rows
+
+
+def write_table(rows: list, filepath: str):
+    """Write the rows returned by `summarize_archive` to a csv file with one
+    line per timestamp and one column per metric
+
+    Args:
+        rows (list): rows returned by `summarize_archive`
+
+        filepath (str): destination of the csv file
+
+    Returns:
+        (bool): True if completed successfully
+    """
+    if not rows:
+        return None
+
+    filepath = Path(filepath).expanduser().absolute()
+    with open(filepath, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: f'{v:.6g}' if isinstance(v, float) else v
+                             for k, v in row.items()})
+    return True
@@ -13,7 +13,8 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/samashti/chrs-persiann-util",
     packages=['chrs_persiann'],
-    install_requires=['setuptools'],
+    install_requires=['setuptools', 'numpy'],
+    extras_require={'tif': ['rasterio']},
     entry_points={},
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from chrs_persiann.planner import (parse_timestamps, format_timestamps,
+                                   validate_period, expected_timestamps,
+                                   expected_count, plan_order,
+                                   missing_timestamps, find_gaps)
+
+
+def test_parse_timestamps():
+    parsed = parse_timestamps(['2020022923', '2021022900', '2021010124',
+                               '2021130100', '202101010', '2021010100x',
+                               'abcdefghij', '1983010100'])
+    assert parsed[0] == np.datetime64('2020-02-29T23')
+    assert np.isnat(parsed[1:7]).all()
+    assert parsed[7] == np.datetime64('1983-01-01T00')
+    assert format_timestamps(parsed[[0, 7]]).tolist() == ['2020022923',
+                                                          '1983010100']
+
+
+@pytest.mark.parametrize('start, end, data_type, timestep, message', [
+    ('2021010105', '2021010300', 'PERSIANN', '3hrly', 'Invalid start hour 05'),
+    ('2021010100', '2021010313', 'PDIR', '6hrly', 'Invalid end hour 13'),
+    ('2021010100', '2021010300', 'CDR', '1hrly', 'not available for CDR'),
+    ('2002120100', '2003020100', 'CCS', 'daily', 'available from 2003010100'),
+    ('2021010300', '2021010100', 'PERSIANN', 'daily', 'is before start'),
+    ('2099010100', '2099020100', 'PDIR', 'daily', 'is too late'),
+    ('2021023000', '2021030100', 'PERSIANN', 'daily', 'Invalid start date'),
+])
+def test_validate_period_rejects(start, end, data_type, timestep, message):
+    with pytest.raises(ValueError, match=message):
+        validate_period(start, end, data_type, timestep)
+
+
+def test_plan_order():
+    plan = plan_order('2021010100', '2021010300', 'CCS', '3hrly', 'Tif')
+    assert plan['files'] == 17
+    assert plan['estimated_bytes'] == 17 * 3000 * 9000 * 4
+
+    plan = plan_order('2000030100', '2021120100', 'PERSIANN', 'monthly')
+    assert plan['files'] == 262
+
+
+@pytest.mark.parametrize('timestep', ['1hrly', '3hrly', 'daily', 'monthly',
+                                      'yearly'])
+def test_expected_count_matches_timestamps(timestep):
+    stamps = expected_timestamps('2019010100', '2021063000', timestep)
+    assert stamps.size == expected_count('2019010100', '2021063000', timestep)
+    assert (np.diff(stamps) > np.timedelta64(0)).all()
+
+
+def test_expected_rejects_malformed_dates():
+    with pytest.raises(ValueError, match='Invalid end date'):
+        expected_timestamps('2021010100', '20210105', 'daily')
+    with pytest.raises(ValueError, match='Invalid start date'):
+        expected_count('2021130100', '2021010500', 'daily')
+
+
+def test_missing_timestamps_and_gaps():
+    expected = expected_timestamps('2000030100', '2021123123', '1hrly')
+    rng = np.random.default_rng(0)
+    present = rng.permutation(expected[rng.random(expected.size) > 0.01])
+
+    missing = missing_timestamps(expected, present)
+    np.testing.assert_array_equal(missing, np.setdiff1d(expected, present))
+
+    gaps = find_gaps(missing, '1hrly')
+    spans = (gaps[:, 1] - gaps[:, 0]).astype(np.int64) + 1
+    assert spans.sum() == missing.size
+    assert (gaps[1:, 0] - gaps[:-1, 1] > np.timedelta64(1, 'h')).all()
+
+
+def test_missing_timestamps_from_strings():
+    expected = expected_timestamps('2021010100', '2021010500', 'daily')
+    missing = missing_timestamps(expected, ['2021010200', '2021010300'])
+    assert format_timestamps(missing).tolist() == ['2021010100', '2021010400',
+                                                   '2021010500']
+    assert find_gaps(missing, 'daily').tolist() == [
+        [np.datetime64('2021-01-01'), np.datetime64('2021-01-01')],
+        [np.datetime64('2021-01-04'), np.datetime64('2021-01-05')],
+    ]
+    assert find_gaps(missing[:0], 'daily').shape == (0, 2)
+
+
+def test_expected_rejects_non_dates():
+    with pytest.raises(ValueError, match='Invalid start date 2021010100'):
+        expected_timestamps(2021010100, '2021010300', 'daily')
+    with pytest.raises(ValueError, match='Invalid start date'):
+        validate_period(2021010100, '2021010300', 'PERSIANN', 'daily')
+
+
+def test_expected_rejects_unaligned_hours():
+    with pytest.raises(ValueError, match='Invalid start hour 01 for 3hrly'):
+        expected_timestamps('2021010101', '2021010200', '3hrly')
+    with pytest.raises(ValueError, match='Invalid end hour 07 for 6hrly'):
+        expected_count(np.datetime64('2021-01-01T00'),
+                       np.datetime64('2021-01-02T07'), '6hrly')
+
+
+def test_plan_order_from_gaps():
+    expected = expected_timestamps('2021010100', '2021013121', '3hrly')
+    present = np.concatenate((expected[:40], expected[60:]))
+    gaps = find_gaps(missing_timestamps(expected, present), '3hrly')
+
+    plan = plan_order(gaps[0, 0], gaps[0, 1], 'CCS', '3hrly')
+    assert plan['files'] == 20
+    assert plan['start'] == expected[40] and plan['end'] == expected[59]
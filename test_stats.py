@@ -0,0 +1,148 @@
+import zipfile
+import numpy as np
+import pytest
+
+from chrs_persiann.stats import QuantileSketch, RasterStats, summarize_archive
+
+
+HEADER = ('ncols {ncols}\nnrows {nrows}\nxllcorner 0\nyllcorner -60\n'
+          'cellsize {cellsize}\nNODATA_value -9999\n')
+
+
+def dry_field(shape, dry=0.7, seed=0):
+    """Zero-inflated precipitation field, like a daily PERSIANN grid"""
+    rng = np.random.default_rng(seed)
+    grid = rng.gamma(0.5, 4.0, shape).astype(np.float32)
+    grid[rng.random(shape) < dry] = 0.0
+    return grid
+
+
+def write_arcgrid(archive, grids, cellsize=0.25, wrap=None):
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for i, grid in enumerate(grids):
+            nrows, ncols = grid.shape
+            text = HEADER.format(ncols=ncols, nrows=nrows, cellsize=cellsize)
+            for row in grid:
+                values = [f'{v:g}' for v in row]
+                step = wrap or ncols
+                for j in range(0, ncols, step):
+                    text += ' '.join(values[j:j + step]) + '\n'
+            zf.writestr(f'PERSIANN_1d2021{i + 1:03d}.asc', text)
+
+
+def test_sketch_zero_inflated_percentiles():
+    values = dry_field(200000).ravel()
+    sketch = QuantileSketch()
+    sketch.update(values)
+
+    q = [10, 50, 70, 80, 90, 99]
+    approx = sketch.percentiles(q)
+    exact = np.percentile(values, q)
+    assert approx[0] == 0.0 and approx[1] == 0.0
+    np.testing.assert_allclose(approx[3:], exact[3:], rtol=0.03)
+
+
+def test_sketch_merge_matches_single_pass():
+    values = dry_field(100000, dry=0.4).ravel()
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    whole.update(values)
+    first.update(values[:30000])
+    second.update(values[30000:])
+
+    merged = first.merge(second)
+    np.testing.assert_array_equal(merged.counts, whole.counts)
+    np.testing.assert_array_equal(merged.percentiles([50, 90]),
+                                  whole.percentiles([50, 90]))
+
+
+def test_raster_stats_chunks_skip_nodata():
+    grid = dry_field((100, 60))
+    grid[:5] = -9999
+    grid[10, 10] = np.nan
+
+    stats = RasterStats()
+    for row in range(0, grid.shape[0], 7):
+        stats.update(grid[row:row + 7])
+
+    valid = grid[(grid != -9999) & ~np.isnan(grid)]
+    res = stats.result()
+    assert res['count'] == valid.size
+    assert res['mean'] == pytest.approx(valid.mean(dtype=np.float64))
+    assert res['max'] == valid.max()
+    assert res['wet_fraction'] == pytest.approx((valid > 0.1).mean())
+
+
+@pytest.mark.parametrize('wrap', [None, 7])
+def test_summarize_archive(tmp_path, wrap):
+    grids = [np.round(dry_field((48, 144), seed=i), 2) for i in range(3)]
+    archive = tmp_path / 'PERSIANN.zip'
+    write_arcgrid(archive, grids, cellsize=2.5, wrap=wrap)
+
+    rows = summarize_archive(archive, regions={'box': (10, -10, 20, 10)},
+                             chunk_rows=5)
+
+    assert [r['timestamp'] for r in rows] == ['2021001', '2021002', '2021003']
+    for row, grid in zip(rows, grids):
+        box = grid[20:28, 4:8]
+        assert row['global_count'] == grid.size
+        assert row['global_mean'] == pytest.approx(grid.mean(dtype=np.float64))
+        assert row['box_count'] == box.size
+        assert row['box_max'] == box.max()
+        assert row['global_p50'] == 0.0
+
+
+@pytest.mark.parametrize('nodata', [-9999, None])
+def test_summarize_archive_tif_matches_arcgrid(tmp_path, nodata):
+    rasterio = pytest.importorskip('rasterio')
+    from rasterio.io import MemoryFile
+    from rasterio.transform import from_origin
+
+    grids = [np.round(dry_field((48, 144), seed=i), 2) for i in range(2)]
+    for grid in grids:
+        grid[:3] = -9999
+
+    ascii = tmp_path / 'PERSIANN_asc.zip'
+    write_arcgrid(ascii, grids, cellsize=2.5)
+
+    tif = tmp_path / 'PERSIANN_tif.zip'
+    with zipfile.ZipFile(tif, 'w') as zf:
+        for i, grid in enumerate(grids):
+            profile = {
+                'driver': 'GTiff', 'dtype': 'float32', 'count': 1,
+                'height': grid.shape[0], 'width': grid.shape[1],
+                'transform': from_origin(0, 60, 2.5, 2.5), 'nodata': nodata,
+            }
+            with MemoryFile() as mem:
+                with mem.open(**profile) as dst:
+                    dst.write(grid, 1)
+                zf.writestr(f'PERSIANN_1d2021{i + 1:03d}.tif', mem.read())
+
+    regions = {'box': (10, -10, 20, 10)}
+    expected = summarize_archive(ascii, regions=regions, chunk_rows=5)
+    rows = summarize_archive(tif, regions=regions, chunk_rows=5)
+
+    assert rows == expected
+    assert rows[0]['global_count'] == 45 * 144
+
+
+def test_summarize_archive_rejects_bad_inputs(tmp_path):
+    archive = tmp_path / 'PERSIANN.zip'
+    write_arcgrid(archive, [dry_field((48, 144))], cellsize=2.5)
+
+    with pytest.raises(ValueError, match='does not overlap'):
+        summarize_archive(archive, regions={'west': (-100, -10, -80, 10)})
+    with pytest.raises(ValueError, match='reserved'):
+        summarize_archive(archive, regions={'global': (0, -10, 10, 10)})
+
+    netcdf = tmp_path / 'PERSIANN_nc.zip'
+    with zipfile.ZipFile(netcdf, 'w') as zf:
+        zf.writestr('PERSIANN_1d2021001.nc', b'CDF')
+    with pytest.raises(ValueError, match='NetCDF'):
+        summarize_archive(netcdf)
+
+    truncated = tmp_path / 'PERSIANN_bad.zip'
+    with zipfile.ZipFile(truncated, 'w') as zf:
+        zf.writestr('PERSIANN_1d2021001.asc',
+                    HEADER.format(ncols=4, nrows=3, cellsize=1) + '0 1 2 3\n0 1\n')
+    with pytest.raises(ValueError, match='expected 3 rows of 4'):
+        summarize_archive(truncated)